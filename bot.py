@@ -8,24 +8,39 @@ import os
 import sys
 import logging
 import random
+import secrets
 import asyncio
-from datetime import datetime, timedelta
-from typing import Dict, List, Set
+import signal
+import time
+from functools import lru_cache
+from itertools import islice
+from operator import itemgetter
+from datetime import date, datetime
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, ContextTypes, CallbackQueryHandler, MessageHandler, filters
-from flask import Flask
-from threading import Thread
+from telegram.constants import ParseMode
+from telegram.ext import Application, CommandHandler, ContextTypes, CallbackQueryHandler, Defaults
+from aiohttp import web
 
 # ========== DATABASE IMPORTS ==========
-from models import init_db, User, Prediction, Bet, ValueBet, SystemLog
-from database import DatabaseManager
+from models import init_db, User, Prediction, ValueBet
+from database import DatabaseManager, check_database_health
 
 # ========== CONFIGURATION ==========
 BOT_TOKEN = os.environ.get("BOT_TOKEN")
 API_KEY = os.environ.get("FOOTBALL_DATA_API_KEY")
 ADMIN_USER_ID = os.environ.get("ADMIN_USER_ID", "").split(",")  # Comma-separated admin IDs
 INVITE_ONLY = os.environ.get("INVITE_ONLY", "true").lower() == "true"  # Default: true
+INVITE_CODE = os.environ.get("INVITE_CODE", "invite123")  # Redeemed with /start <code>
 DATABASE_URL = os.environ.get("DATABASE_URL")  # PostgreSQL connection string
+WEBHOOK_URL = os.environ.get("WEBHOOK_URL")  # Public base URL; when set, Telegram pushes updates instead of polling
+# Webhook requests must prove they come from Telegram: the secret token header is always
+# required (a random one is generated per boot if none is configured), and the route
+# itself lives at an unguessable path that is registered afresh on every start
+WEBHOOK_SECRET = os.environ.get("WEBHOOK_SECRET") or secrets.token_urlsafe(32)
+WEBHOOK_PATH = f"/telegram/{secrets.token_urlsafe(24)}"
+
+# Parsed once: admin checks are plain int set lookups
+ADMIN_IDS = frozenset(int(x.strip()) for x in ADMIN_USER_ID if x.strip().isdigit())
 
 if not BOT_TOKEN:
     print("❌ ERROR: BOT_TOKEN not set!")
@@ -38,31 +53,90 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# ========== FLASK FOR RAILWAY ==========
-app = Flask(__name__)
+# ========== WEB SERVER FOR RAILWAY ==========
+async def home(request: web.Request) -> web.Response:
+    return web.Response(text="⚽ Serie AI Bot - Database Edition")
+
+async def health(request: web.Request) -> web.Response:
+    return web.Response(text="✅ OK")
 
-@app.route('/')
-def home():
-    return "⚽ Serie AI Bot - Database Edition"
+BOT_APPLICATION_KEY = web.AppKey("bot_application", Application)
+
+async def telegram_webhook(request: web.Request) -> web.Response:
+    """Hand an update pushed by Telegram to the bot's update queue"""
+    token = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+    if not secrets.compare_digest(token, WEBHOOK_SECRET):
+        return web.Response(status=403)
+    
+    application = request.app[BOT_APPLICATION_KEY]
+    await application.update_queue.put(Update.de_json(await request.json(), application.bot))
+    return web.Response()
 
-@app.route('/health')
-def health():
-    return "✅ OK", 200
+async def start_web_server(application: Application):
+    """Serve the Railway endpoints (and the webhook, if enabled) on the bot's own event loop"""
+    web_app = web.Application()
+    web_app.router.add_get('/', home)
+    web_app.router.add_get('/health', health)
+    if WEBHOOK_URL:
+        web_app[BOT_APPLICATION_KEY] = application
+        web_app.router.add_post(WEBHOOK_PATH, telegram_webhook)
 
-def run_flask():
+    runner = web.AppRunner(web_app)
+    await runner.setup()
     port = int(os.getenv("PORT", "8080"))
-    app.run(host='0.0.0.0', port=port, debug=False, use_reloader=False)
+    await web.TCPSite(runner, '0.0.0.0', port).start()
+    application.bot_data['web_runner'] = runner
+    
+    if WEBHOOK_URL:
+        await application.bot.set_webhook(
+            url=WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=Update.ALL_TYPES,
+            drop_pending_updates=True
+        )
+
+async def stop_web_server(application: Application):
+    """Release the web server port on shutdown"""
+    runner = application.bot_data.pop('web_runner', None)
+    if runner:
+        await runner.cleanup()
+
+async def serve_webhook(application: Application):
+    """Run the bot on webhook updates; the aiohttp server above receives them"""
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+    
+    # Same lifecycle run_polling drives, minus the getUpdates loop
+    async with application:
+        await application.post_init(application)
+        await application.start()
+        await stop_event.wait()
+        await application.stop()
+    await application.post_shutdown(application)
 
 # ========== DATA MANAGER ==========
+# League codes and display names, shared by the data layer and the standings menu
+LEAGUES = {
+    'SA': '🇮🇹 Serie A',
+    'PL': '🏴󠁧󠁢󠁥󠁮󠁧󠁿 Premier League',
+    'PD': '🇪🇸 La Liga',
+    'BL1': '🇩🇪 Bundesliga'
+}
+
 class DataManager:
     """Simple and reliable data manager"""
     
     def __init__(self):
-        self.leagues = {
-            'SA': '🇮🇹 Serie A',
-            'PL': '🏴󠁧󠁢󠁥󠁮󠁧󠁿 Premier League', 
-            'PD': '🇪🇸 La Liga',
-            'BL1': '🇩🇪 Bundesliga'
+        self.leagues = LEAGUES
+        
+        # Teams for each league
+        self.teams = {
+            'SA': ('Inter', 'Milan', 'Juventus', 'Napoli', 'Roma', 'Lazio', 'Atalanta', 'Fiorentina'),
+            'PL': ('Man City', 'Liverpool', 'Arsenal', 'Chelsea', 'Man Utd', 'Tottenham', 'Newcastle', 'Aston Villa'),
+            'PD': ('Barcelona', 'Real Madrid', 'Atletico', 'Sevilla', 'Valencia', 'Betis', 'Villarreal', 'Athletic'),
+            'BL1': ('Bayern', 'Dortmund', 'Leipzig', 'Leverkusen', 'Frankfurt', 'Wolfsburg', 'Gladbach', 'Hoffenheim')
         }
         
         self.todays_matches = [
@@ -72,50 +146,35 @@ class DataManager:
             {'league': 'SA', 'home': 'Juventus', 'away': 'Napoli', 'time': '18:00'},
             {'league': 'BL1', 'home': 'Bayern', 'away': 'Dortmund', 'time': '17:30'}
         ]
+        
+        # The fixture list is static, so resolve league names once
+        self.matches = [
+            {
+                'home': match['home'],
+                'away': match['away'],
+                'league': self.leagues.get(match['league'], 'Unknown'),
+                'time': match['time']
+            }
+            for match in self.todays_matches
+        ]
+        
+        # Warm the score cache for every known team so analysis never recomputes them
+        for teams in self.teams.values():
+            for team in teams:
+                self._name_score(team)
     
     def get_todays_matches(self):
         """Get today's matches"""
-        matches = []
-        for match in self.todays_matches:
-            league_name = self.leagues.get(match['league'], 'Unknown')
-            matches.append({
-                'home': match['home'],
-                'away': match['away'], 
-                'league': league_name,
-                'time': match['time']
-            })
-        return matches
+        return self.matches
     
     def get_standings(self, league_code):
         """Get standings"""
         if league_code not in self.leagues:
             return {'league_name': 'Unknown', 'standings': []}
         
-        league_name = self.leagues[league_code]
-        
-        # Teams for each league
-        teams_map = {
-            'SA': ['Inter', 'Milan', 'Juventus', 'Napoli', 'Roma', 'Lazio', 'Atalanta', 'Fiorentina'],
-            'PL': ['Man City', 'Liverpool', 'Arsenal', 'Chelsea', 'Man Utd', 'Tottenham', 'Newcastle', 'Aston Villa'],
-            'PD': ['Barcelona', 'Real Madrid', 'Atletico', 'Sevilla', 'Valencia', 'Betis', 'Villarreal', 'Athletic'],
-            'BL1': ['Bayern', 'Dortmund', 'Leipzig', 'Leverkusen', 'Frankfurt', 'Wolfsburg', 'Gladbach', 'Hoffenheim']
-        }
-        
-        teams = teams_map.get(league_code, [])
-        standings = []
-        
-        for i, team in enumerate(teams, 1):
-            played = random.randint(20, 30)
-            won = random.randint(played//2, played-5)
-            draw = random.randint(3, played-won-3)
-            lost = played - won - draw
-            gf = random.randint(30, 70)
-            ga = random.randint(15, 50)
-            gd = gf - ga
-            points = won*3 + draw
-            
-            standings.append({
-                'position': i,
+        standings = [
+            {
+                'position': position,
                 'team': team,
                 'played': played,
                 'won': won,
@@ -123,21 +182,57 @@ class DataManager:
                 'lost': lost,
                 'gf': gf,
                 'ga': ga,
-                'gd': gd,
+                'gd': gf - ga,
                 'points': points
-            })
-        
-        standings.sort(key=lambda x: x['points'], reverse=True)
+            }
+            for position, (team, played, won, draw, lost, gf, ga, points)
+            in enumerate(self._standings_rows(league_code, date.today().toordinal()), 1)
+        ]
         
         return {
-            'league_name': league_name,
+            'league_name': self.leagues[league_code],
             'standings': standings
         }
     
-    def analyze_match(self, home, away):
-        """Analyze match"""
-        home_score = sum(ord(c) for c in home.lower()) % 100
-        away_score = sum(ord(c) for c in away.lower()) % 100
+    @lru_cache(maxsize=32)
+    def _standings_rows(self, league_code, day):
+        """Sorted table rows for one league, generated once per calendar day"""
+        teams = self.teams.get(league_code, ())
+        rows = []
+        randint = random.randint
+        
+        # Plain tuples; get_standings numbers them and builds the dicts
+        for team in teams:
+            played = randint(20, 30)
+            # At least 6 non-wins, so the draw range below is never empty
+            won = randint(played//2, played-6)
+            draw = randint(3, played-won-3)
+            lost = played - won - draw
+            gf = randint(30, 70)
+            ga = randint(15, 50)
+            rows.append((team, played, won, draw, lost, gf, ga, won*3 + draw))
+        
+        rows.sort(key=itemgetter(7), reverse=True)
+        
+        # Tuple, not list: cached values are shared between callers
+        return tuple(rows)
+    
+    @staticmethod
+    @lru_cache(maxsize=2**10)
+    def _name_score(name):
+        """Sum of the lowercased name's character codes, mod 100"""
+        lowered = name.lower()
+        if lowered.isascii():
+            # Summing bytes iterates in C with no per-character ord() call
+            return sum(lowered.encode()) % 100
+        return sum(map(ord, lowered)) % 100
+    
+    @staticmethod
+    @lru_cache(maxsize=2**10)
+    def _analyze_core(home, away):
+        """Deterministic part of the analysis, memoized per matchup"""
+        home_score = DataManager._name_score(home)
+        away_score = DataManager._name_score(away)
         
         if home_score + away_score == 0:
             home_score, away_score = 50, 50
@@ -149,26 +244,49 @@ class DataManager:
         home_prob -= draw_prob / 3
         away_prob -= draw_prob / 3
         
-        prediction = "1" if home_prob > away_prob and home_prob > draw_prob else "X" if draw_prob > home_prob and draw_prob > away_prob else "2"
-        confidence = max(home_prob, draw_prob, away_prob)
+        # The most likely outcome is the prediction; ties go to 1, then X
+        if home_prob >= away_prob and home_prob >= draw_prob:
+            prediction, confidence = "1", home_prob
+        elif draw_prob >= away_prob:
+            prediction, confidence = "X", draw_prob
+        else:
+            prediction, confidence = "2", away_prob
+        
+        # Tuple, not dict: cached values are shared between callers
+        return (
+            round(home_prob, 1),
+            round(draw_prob, 1),
+            round(away_prob, 1),
+            prediction,
+            round(confidence, 1),
+            max(0, round((home_score/100) * 3)),
+            max(0, round((away_score/100) * 2)),
+            round(100 / confidence, 2),
+            # Same 3.0-7.9 range as the old random draw, but stable per matchup
+            3.0 + ((home_score * 31 + away_score) % 50) / 10
+        )
+    
+    def analyze_match(self, home, away):
+        """Analyze match"""
+        home_prob, draw_prob, away_prob, prediction, confidence, home_goals, away_goals, odds, edge = self._analyze_core(home, away)
         
         return {
             'probabilities': {
-                'home': round(home_prob, 1),
-                'draw': round(draw_prob, 1),
-                'away': round(away_prob, 1)
+                'home': home_prob,
+                'draw': draw_prob,
+                'away': away_prob
             },
             'prediction': prediction,
-            'confidence': round(confidence, 1),
+            'confidence': confidence,
             'goals': {
-                'home': max(0, round((home_score/100) * 3)),
-                'away': max(0, round((away_score/100) * 2))
+                'home': home_goals,
+                'away': away_goals
             },
             'value_bet': {
                 'market': 'Match Result',
                 'selection': prediction,
-                'odds': round(1/({'1': home_prob, 'X': draw_prob, '2': away_prob}[prediction]/100), 2),
-                'edge': round(random.uniform(3, 8), 1)
+                'odds': odds,
+                'edge': edge
             }
         }
 
@@ -179,19 +297,12 @@ data_manager = DataManager()
 class SimpleUserStorage:
     """Temporary user storage until full DB migration"""
     
+    __slots__ = ('allowed_users', 'subscribers')
+    
     def __init__(self):
-        self.allowed_users = set()
-        self.subscribers = set()
-        
         # Add admin users automatically
-        for admin_id in ADMIN_USER_ID:
-            if admin_id.strip().isdigit():
-                self.allowed_users.add(int(admin_id.strip()))
-    
-    def is_user_allowed(self, user_id: int) -> bool:
-        if not INVITE_ONLY:
-            return True
-        return user_id in self.allowed_users
+        self.allowed_users = set(ADMIN_IDS)
+        self.subscribers = set()
     
     def add_user(self, user_id: int) -> bool:
         if user_id not in self.allowed_users:
@@ -202,61 +313,43 @@ class SimpleUserStorage:
 user_storage = SimpleUserStorage()
 
 # ========== ACCESS CONTROL ==========
+INVITE_ACCEPTED_TEXT = (
+    "✅ *Invitation accepted!* Welcome to Serie AI Bot.\n\n"
+    "Use /start to access all features."
+)
+
+ACCESS_RESTRICTED_TEXT = (
+    "🔒 *Access Restricted*\n\n"
+    "This bot is invitation-only.\n"
+    "Please contact the administrator for access.\n\n"
+    "If you have an invite code, use:\n"
+    "`/start <invite code>`"
+)
+
 def access_control(func):
     """Decorator to check if user is allowed"""
+    # Invite-only mode is fixed at startup: without it there is nothing to check
+    if not INVITE_ONLY:
+        return func
+    
+    # The set is only ever mutated in place, so the wrapper can hold it directly
+    allowed_users = user_storage.allowed_users
+    
     async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE, *args, **kwargs):
-        user_id = update.effective_user.id
-        
-        if not user_storage.is_user_allowed(user_id):
-            # Check for invite code
-            if update.message and update.message.text:
-                if update.message.text.startswith('/start'):
-                    parts = update.message.text.split()
-                    if len(parts) > 1 and parts[1] == "invite123":
-                        user_storage.add_user(user_id)
-                        await update.message.reply_text(
-                            "✅ *Invitation accepted!* Welcome to Serie AI Bot.\n\n"
-                            "Use /start to access all features.",
-                            parse_mode='Markdown'
-                        )
-                        return
-            
-            await update.message.reply_text(
-                "🔒 *Access Restricted*\n\n"
-                "This bot is invitation-only.\n"
-                "Please contact the administrator for access.\n\n"
-                "If you have an invite code, use:\n"
-                "`/start invite123`",
-                parse_mode='Markdown'
-            )
+        if update.effective_user.id not in allowed_users:
+            await update.effective_message.reply_text(ACCESS_RESTRICTED_TEXT)
             return
         
         return await func(update, context, *args, **kwargs)
     
     return wrapper
 
-# ========== COMMAND HANDLERS ==========
-@access_control
-async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Main menu"""
-    status = "✅ *Real Data Enabled*" if API_KEY else "⚠️ *Using Simulation*"
-    
-    # Create or update user in database
-    try:
-        db = DatabaseManager()
-        user = db.get_or_create_user(
-            telegram_id=update.effective_user.id,
-            username=update.effective_user.username,
-            first_name=update.effective_user.first_name,
-            last_name=update.effective_user.last_name
-        )
-        db.close()
-        logger.info(f"✅ User {update.effective_user.id} synced to database")
-    except Exception as e:
-        logger.error(f"❌ Database sync failed: {e}")
-    
-    text = f"""
-{status}
+# ========== MENUS ==========
+# API_KEY is fixed for the life of the process, so the welcome text is too
+DATA_STATUS = "✅ *Real Data Enabled*" if API_KEY else "⚠️ *Using Simulation*"
+
+WELCOME_TEXT = f"""
+{DATA_STATUS}
 
 ⚽ *SERIE AI PREDICTION BOT*
 
@@ -270,200 +363,58 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 👇 Tap any button below:
 """
-    
-    keyboard = [
-        [InlineKeyboardButton("📅 Today's Matches", callback_data="show_matches")],
-        [InlineKeyboardButton("🏆 League Standings", callback_data="show_standings_menu")],
-        [InlineKeyboardButton("🎯 Smart Prediction", callback_data="show_predict_info")],
-        [InlineKeyboardButton("💎 Value Bets", callback_data="show_value_bets")],
-        [InlineKeyboardButton("📊 My Stats", callback_data="user_stats")],
-        [InlineKeyboardButton("ℹ️ Help & Guide", callback_data="show_help")]
-    ]
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    if update.message:
-        await update.message.reply_text(text, reply_markup=reply_markup, parse_mode='Markdown')
-    else:
-        await update.callback_query.edit_message_text(text, reply_markup=reply_markup, parse_mode='Markdown')
 
-@access_control
-async def quick_predict_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Quick prediction command - WITH DATABASE SAVE"""
-    args = context.args
-    if len(args) < 2:
-        await update.message.reply_text(
-            "Usage: `/predict [Home Team] [Away Team]`\n"
-            "Example: `/predict Inter Milan`",
-            parse_mode='Markdown'
-        )
-        return
-    
-    home, away = args[0], args[1]
-    analysis = data_manager.analyze_match(home, away)
-    
-    probs = analysis['probabilities']
-    goals = analysis['goals']
-    value = analysis['value_bet']
-    
-    # ========== SAVE TO DATABASE ==========
-    try:
-        db = DatabaseManager()
-        prediction = db.save_prediction(
-            telegram_id=update.effective_user.id,
-            home_team=home,
-            away_team=away,
-            league="Quick Prediction",
-            predicted_result=analysis['prediction'],
-            home_prob=probs['home'],
-            draw_prob=probs['draw'],
-            away_prob=probs['away'],
-            confidence=analysis['confidence']
-        )
-        db.close()
-        logger.info(f"✅ Prediction saved to DB: ID {prediction.id}")
-        save_note = "✅ *Saved to your history*"
-    except Exception as e:
-        logger.error(f"❌ Database save failed: {e}")
-        save_note = "⚠️ *History not saved*"
-    # ========== END DATABASE SAVE ==========
-    
-    response = f"""
+MAIN_MENU_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("📅 Today's Matches", callback_data="show_matches")],
+    [InlineKeyboardButton("🏆 League Standings", callback_data="show_standings_menu")],
+    [InlineKeyboardButton("🎯 Smart Prediction", callback_data="show_predict_info")],
+    [InlineKeyboardButton("💎 Value Bets", callback_data="show_value_bets")],
+    [InlineKeyboardButton("📊 My Stats", callback_data="user_stats")],
+    [InlineKeyboardButton("ℹ️ Help & Guide", callback_data="show_help")]
+])
+
+# Keyword arguments shared by the send and edit paths of the main menu
+MAIN_MENU_KWARGS = {'text': WELCOME_TEXT, 'reply_markup': MAIN_MENU_MARKUP}
+
+STANDINGS_MENU_TEXT = "🏆 *Select League Standings:*"
+
+STANDINGS_MENU_MARKUP = InlineKeyboardMarkup(
+    [[InlineKeyboardButton(name, callback_data=f"standings_{code}")] for code, name in LEAGUES.items()]
+    + [[InlineKeyboardButton("🔙 Back to Menu", callback_data="back_to_menu")]]
+)
+
+STANDINGS_BACK_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🔙 Back to Standings", callback_data="show_standings_menu")],
+    [InlineKeyboardButton("🏠 Main Menu", callback_data="back_to_menu")]
+])
+
+BACK_TO_MENU_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🏠 Main Menu", callback_data="back_to_menu")]
+])
+
+# ========== RESPONSE TEMPLATES ==========
+QUICK_PREDICTION_TEMPLATE = """
 ⚡ *QUICK PREDICTION: {home} vs {away}*
 
 📊 *MATCH RESULT:*
-• Home Win: {probs['home']}%
-• Draw: {probs['draw']}%
-• Away Win: {probs['away']}%
-• ➡️ Predicted: *{analysis['prediction']}* ({analysis['confidence']}% confidence)
+• Home Win: {home_prob}%
+• Draw: {draw_prob}%
+• Away Win: {away_prob}%
+• ➡️ Predicted: *{prediction}* ({confidence}% confidence)
 
 🥅 *EXPECTED SCORE:*
-• {goals['home']}-{goals['away']} (Total: {goals['home'] + goals['away']})
+• {home_goals}-{away_goals} (Total: {total_goals})
 
 💎 *BEST VALUE BET:*
-• {value['market']}: {value['selection']} @ {value['odds']}
-• Edge: +{value['edge']}% | Stake: ⭐⭐
+• {market}: {selection} @ {odds}
+• Edge: +{edge}% | Stake: ⭐⭐
 
 {save_note}
 
 _Enhanced with AI analysis_
 """
-    
-    await update.message.reply_text(response, parse_mode='Markdown')
 
-@access_control
-async def todays_matches_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Text command: /matches"""
-    matches = data_manager.get_todays_matches()
-    
-    if not matches:
-        await update.message.reply_text("No matches scheduled for today.")
-        return
-    
-    response = "📅 *TODAY'S FOOTBALL MATCHES*\n\n"
-    
-    # Group by league
-    matches_by_league = {}
-    for match in matches:
-        league = match['league']
-        if league not in matches_by_league:
-            matches_by_league[league] = []
-        matches_by_league[league].append(match)
-    
-    for league_name, league_matches in matches_by_league.items():
-        response += f"*{league_name}*\n"
-        for match in league_matches:
-            response += f"⏰ {match['home']} vs {match['away']} ({match['time']})\n"
-        response += "\n"
-    
-    response += f"_Total: {len(matches)} matches_"
-    
-    await update.message.reply_text(response, parse_mode='Markdown')
-
-@access_control
-async def standings_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Text command: /standings"""
-    keyboard = [
-        [InlineKeyboardButton("🇮🇹 Serie A", callback_data="standings_SA")],
-        [InlineKeyboardButton("🏴󠁧󠁢󠁥󠁮󠁧󠁿 Premier League", callback_data="standings_PL")],
-        [InlineKeyboardButton("🇪🇸 La Liga", callback_data="standings_PD")],
-        [InlineKeyboardButton("🇩🇪 Bundesliga", callback_data="standings_BL1")],
-        [InlineKeyboardButton("🔙 Back to Menu", callback_data="back_to_menu")]
-    ]
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    await update.message.reply_text(
-        "🏆 *Select League Standings:*",
-        reply_markup=reply_markup,
-        parse_mode='Markdown'
-    )
-
-@access_control
-async def value_bets_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Value bets command - FROM DATABASE"""
-    # ========== GET FROM DATABASE ==========
-    try:
-        db = DatabaseManager()
-        bets = db.get_todays_value_bets()
-        db.close()
-        
-        if not bets:
-            response = "💎 *NO VALUE BETS TODAY*\n\nNo strong value bets identified for today."
-            await update.message.reply_text(response, parse_mode='Markdown')
-            return
-        
-        response = "💎 *TODAY'S TOP VALUE BETS*\n\n"
-        for i, bet in enumerate(bets, 1):
-            response += f"{i}. *{bet.match}* ({bet.league})\n"
-            response += f"   • Bet: {bet.selection} ({bet.bet_type})\n"
-            response += f"   • Odds: {bet.odds} | Probability: {bet.probability}%\n"
-            response += f"   • Edge: +{bet.edge}% | Confidence: {bet.confidence*100:.0f}%\n"
-            response += f"   • Stake: {bet.recommended_stake}\n\n"
-        
-        response += "📈 *Value Betting Strategy:*\n"
-        response += "• Only bet when edge > 3%\n"
-        response += "• Use 1/4 Kelly stake (conservative)\n"
-        response += "• Track all bets for analysis\n\n"
-        response += "_Data from Serie AI Database_"
-        
-    except Exception as e:
-        logger.error(f"❌ Database value bets failed: {e}")
-        response = "❌ Could not load value bets. Please try again later."
-    # ========== END DATABASE CODE ==========
-    
-    await update.message.reply_text(response, parse_mode='Markdown')
-
-@access_control
-async def mystats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Show user statistics - WITH DATABASE"""
-    user_id = update.effective_user.id
-    first_name = update.effective_user.first_name
-    
-    logger.info(f"📊 Getting stats for user {user_id}")
-    
-    try:
-        # Get database connection
-        db = DatabaseManager()
-        
-        # First, ensure user exists in database
-        user = db.get_or_create_user(
-            telegram_id=user_id,
-            username=update.effective_user.username,
-            first_name=first_name,
-            last_name=update.effective_user.last_name
-        )
-        
-        # Get user statistics
-        stats = db.get_user_stats(user_id)
-        db.close()
-        
-        total = stats['total_predictions']
-        correct = stats['correct_predictions']
-        accuracy = stats['accuracy']
-        
-        if total == 0:
-            response = f"""
+MYSTATS_EMPTY_TEMPLATE = """
 📊 *YOUR STATISTICS*
 
 👤 User: {first_name}
@@ -479,8 +430,8 @@ async def mystats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 _Your predictions will be saved automatically_
 """
-        else:
-            response = f"""
+
+MYSTATS_TEMPLATE = """
 📊 *YOUR STATISTICS*
 
 👤 User: {first_name}
@@ -493,34 +444,8 @@ _Your predictions will be saved automatically_
 
 🎯 *Recent Predictions:*
 """
-            # Add recent predictions
-            for i, pred in enumerate(stats['recent_predictions'][:3], 1):
-                if pred.is_correct is None:
-                    result_icon = "⏳"
-                    status = "Pending"
-                elif pred.is_correct:
-                    result_icon = "✅"
-                    status = "Correct"
-                else:
-                    result_icon = "❌"
-                    status = "Wrong"
-                
-                response += f"{i}. {pred.home_team} vs {pred.away_team} ({result_icon} {status})\n"
-            
-            if accuracy > 60:
-                response += "\n🏆 *Excellent accuracy! Keep it up!*"
-            elif accuracy > 50:
-                response += "\n👍 *Good work! Room for improvement.*"
-            else:
-                response += "\n💡 *Study the predictions more carefully.*"
-        
-        logger.info(f"✅ Stats shown for user {user_id}: {total} predictions")
-        
-    except Exception as e:
-        logger.error(f"❌ Database error in mystats: {e}", exc_info=True)
-        
-        # Fallback response
-        response = f"""
+
+MYSTATS_UNAVAILABLE_TEMPLATE = """
 📊 *YOUR STATISTICS*
 
 👤 User: {first_name}
@@ -537,13 +462,55 @@ The statistics service is temporarily unavailable.
 
 _Error details: Database connection failed_
 """
-    
-    await update.message.reply_text(response, parse_mode='Markdown')
 
-@access_control
-async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Text command: /help"""
-    help_text = """
+ADMIN_PANEL_TEMPLATE = """
+🔐 *ADMIN PANEL*
+
+📊 *DATABASE STATISTICS:*
+• Total Users: {total_users}
+• Total Predictions: {total_predictions}
+• Active Value Bets: {total_value_bets}
+• Invite-Only Mode: {invite_mode}
+
+⚙️ *ADMIN COMMANDS:*
+/dbstats - Detailed database statistics
+/adduser [id] - Add user to allowed list
+/listusers - List all allowed users
+/broadcast [msg] - Send message to all users
+
+📈 *USER MANAGEMENT:*
+• Use /adduser to grant access
+• Invite code: `{invite_code}`
+• Database stores all user activity
+
+💾 *DATABASE INFO:*
+• PostgreSQL on Railway
+• Tables: users, predictions, value_bets
+• Auto-saves all predictions
+"""
+
+DBSTATS_TEMPLATE = """
+📊 *DETAILED DATABASE STATISTICS*
+
+👥 *USERS:*
+• Total Users: {total_users}
+• Active Users: {active_users}
+• Premium Users: {premium_users}
+
+🎯 *PREDICTIONS:*
+• Total Predictions: {total_predictions}
+• Correct Predictions: {correct_predictions}
+• Pending Results: {pending_predictions}
+• System Accuracy: {accuracy:.1f}%
+
+💎 *VALUE BETS:*
+• Total Value Bets: {total_value_bets}
+• Active Value Bets: {active_value_bets}
+
+👤 *RECENTLY ACTIVE USERS:*
+"""
+
+HELP_TEXT = """
 🤖 *SERIE AI BOT - COMPLETE HELP GUIDE*
 
 *MAIN COMMANDS:*
@@ -572,8 +539,239 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 🇮🇹 Serie A, 🏴󠁧󠁢󠁥󠁮󠁧󠁿 Premier League
 🇪🇸 La Liga, 🇩🇪 Bundesliga
 """
+
+# ========== BACKGROUND DATABASE WRITES ==========
+def sync_user(tg_user):
+    """Create or update a Telegram user in the database"""
+    with DatabaseManager() as db:
+        db.get_or_create_user(
+            telegram_id=tg_user.id,
+            username=tg_user.username,
+            first_name=tg_user.first_name,
+            last_name=tg_user.last_name
+        )
+    logger.info("✅ User %s synced to database", tg_user.id)
+
+def save_predictions(predictions):
+    """Store a batch of predictions in the users' histories"""
+    with DatabaseManager() as db:
+        saved = db.save_predictions(predictions)
+    logger.info("✅ %s predictions saved to DB", saved)
+
+def touch_users(telegram_ids):
+    """Record activity for users that are already in the database"""
+    with DatabaseManager() as db:
+        updated = db.touch_users(telegram_ids)
+    logger.info("✅ last_seen updated for %s users", updated)
+
+LAST_SEEN_FLUSH_INTERVAL = 30  # seconds
+
+async def write_pending_last_seen(bot_data):
+    """Write the batched last_seen updates collected by start_command"""
+    pending = bot_data.get('pending_last_seen')
+    if not pending:
+        return
+    
+    bot_data['pending_last_seen'] = set()
+    await run_db_write(touch_users, list(pending))
+
+async def flush_last_seen(context: ContextTypes.DEFAULT_TYPE):
+    """JobQueue callback for write_pending_last_seen"""
+    await write_pending_last_seen(context.bot_data)
+
+PREDICTION_FLUSH_INTERVAL = 1  # seconds
+PREDICTION_BATCH_SIZE = 100
+PREDICTION_BACKLOG_LIMIT = 10_000  # rows kept in memory while the database is down
+
+def trim_pending_predictions(bot_data):
+    """Drop the oldest queued predictions beyond PREDICTION_BACKLOG_LIMIT, warning once per outage"""
+    pending = bot_data['pending_predictions']
+    overflow = len(pending) - PREDICTION_BACKLOG_LIMIT
+    if overflow <= 0:
+        return
+    
+    del pending[:overflow]
+    if not bot_data.get('prediction_backlog_full'):
+        bot_data['prediction_backlog_full'] = True
+        logger.warning("⚠️ Prediction backlog full (%s rows): dropping the oldest until the database is back",
+                       PREDICTION_BACKLOG_LIMIT)
+
+async def write_pending_predictions(bot_data):
+    """Write the predictions queued by quick_predict_command in one transaction"""
+    pending = bot_data.get('pending_predictions')
+    if not pending:
+        return
+    
+    bot_data['pending_predictions'] = []
+    try:
+        await asyncio.to_thread(save_predictions, pending)
+    except Exception as e:
+        # Database unreachable: keep the rows (ahead of anything queued meanwhile) for the next flush
+        bot_data['pending_predictions'] = pending + bot_data['pending_predictions']
+        trim_pending_predictions(bot_data)
+        logger.error("❌ Prediction batch re-queued (%s rows): %s", len(pending), e)
+    else:
+        bot_data['prediction_backlog_full'] = False
+
+async def flush_predictions(context: ContextTypes.DEFAULT_TYPE):
+    """JobQueue callback for write_pending_predictions; idle while the probe reports the database down"""
+    if context.bot_data.get('db_alive', True):
+        await write_pending_predictions(context.bot_data)
+
+async def on_shutdown(application: Application):
+    """Stop the web server and write anything still queued"""
+    await stop_web_server(application)
+    await write_pending_predictions(application.bot_data)
+    await write_pending_last_seen(application.bot_data)
+
+DB_PROBE_INTERVAL = 10  # seconds
+
+async def probe_database(context: ContextTypes.DEFAULT_TYPE):
+    """Background liveness probe; handlers read bot_data['db_alive'] instead of pinging"""
+    alive = await asyncio.to_thread(check_database_health)
+    if alive != context.bot_data.get('db_alive', True):
+        if alive:
+            logger.info("✅ Database connection restored")
+        else:
+            logger.error("❌ Database health check failed")
+    context.bot_data['db_alive'] = alive
+
+async def run_db_write(func, *args, **kwargs):
+    """Run a blocking database write in a worker thread so replies never wait on it"""
+    try:
+        await asyncio.to_thread(func, *args, **kwargs)
+        return True
+    except Exception as e:
+        logger.error("❌ Background database write failed: %s", e)
+        return False
+
+async def sync_first_visit(seen_users, tg_user):
+    """Sync a user on first visit; forget them on failure so the next /start retries"""
+    if not await run_db_write(sync_user, tg_user):
+        seen_users.discard(tg_user.id)
+
+# ========== DATABASE READS (run in worker threads) ==========
+VALUE_BETS_TTL = 60  # seconds
+
+@lru_cache(maxsize=2)
+def _load_value_bets(bucket: int):
+    """Today's value bets for one TTL bucket; a new bucket key forces a fresh read.
+    
+    A failed read raises, and lru_cache does not store exceptions, so an outage is
+    retried on the next request instead of being served as an empty list.
+    """
+    with DatabaseManager() as db:
+        return tuple(db.get_todays_value_bets())
+
+def get_value_bets():
+    """Today's value bets, read from the database at most once per TTL window"""
+    return _load_value_bets(int(time.time()) // VALUE_BETS_TTL)
+
+def load_admin_counts():
+    """User, prediction and active value-bet totals for the admin panel"""
+    with DatabaseManager() as db:
+        return (
+            db.db.query(User).count(),
+            db.db.query(Prediction).count(),
+            db.db.query(ValueBet).filter(ValueBet.is_active == True).count()
+        )
+
+def load_db_stats():
+    """Counts and recent users for /dbstats"""
+    with DatabaseManager() as db:
+        counts, recent_users = db.get_system_stats()
+    return (*counts, recent_users)
+
+# ========== COMMAND HANDLERS ==========
+@access_control
+async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Main menu"""
+    # Sync each user once per process; later visits only queue a batched last_seen bump
+    user_id = update.effective_user.id
+    seen_users = context.bot_data.setdefault('seen_users', set())
+    if user_id in seen_users:
+        context.bot_data.setdefault('pending_last_seen', set()).add(user_id)
+    else:
+        # Marked up front so concurrent /starts don't all sync; sync_first_visit undoes it on failure
+        seen_users.add(user_id)
+        context.application.create_task(sync_first_visit(seen_users, update.effective_user))
+    
+    # Only reached from the /start command; effective_message also covers an edited /start
+    await send_main_menu(update.effective_message)
+
+async def start_with_invite_check(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/start entry point: redeem an invite code before the access check"""
+    if INVITE_ONLY and context.args and context.args[0] == INVITE_CODE:
+        if user_storage.add_user(update.effective_user.id):
+            await update.effective_message.reply_text(INVITE_ACCEPTED_TEXT)
+            return
     
-    await update.message.reply_text(help_text, parse_mode='Markdown')
+    await start_command(update, context)
+
+@access_control
+async def quick_predict_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Quick prediction command - WITH DATABASE SAVE"""
+    args = context.args
+    if len(args) < 2:
+        await update.message.reply_text(
+            "Usage: `/predict [Home Team] [Away Team]`\n"
+            "Example: `/predict Inter Milan`"
+        )
+        return
+    
+    home, away = args[0], args[1]
+    analysis = data_manager.analyze_match(home, away)
+    probs = analysis['probabilities']
+    
+    # ========== SAVE TO DATABASE (batched in the background) ==========
+    pending = context.bot_data.setdefault('pending_predictions', [])
+    pending.append({
+        'telegram_id': update.effective_user.id,
+        'home_team': home,
+        'away_team': away,
+        'league': "Quick Prediction",
+        'predicted_result': analysis['prediction'],
+        'home_prob': probs['home'],
+        'draw_prob': probs['draw'],
+        'away_prob': probs['away'],
+        'confidence': analysis['confidence']
+    })
+    if not context.bot_data.get('db_alive', True):
+        trim_pending_predictions(context.bot_data)
+    elif len(pending) >= PREDICTION_BATCH_SIZE:
+        context.application.create_task(write_pending_predictions(context.bot_data))
+    # ========== END DATABASE SAVE ==========
+    
+    await update.message.reply_text(render_quick_prediction(home, away))
+
+@access_control
+async def todays_matches_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Text command: /matches"""
+    await update.message.reply_text(build_matches_text())
+
+@access_control
+async def standings_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Text command: /standings"""
+    await update.message.reply_text(STANDINGS_MENU_TEXT, reply_markup=STANDINGS_MENU_MARKUP)
+
+@access_control
+async def value_bets_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Value bets command - FROM DATABASE"""
+    response = await asyncio.to_thread(build_value_bets_text, context.bot_data.get('db_alive', True))
+    await update.message.reply_text(response)
+
+@access_control
+async def mystats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Show user statistics - WITH DATABASE"""
+    response = await asyncio.to_thread(
+        build_mystats_text, update.effective_user, context.bot_data.get('db_alive', True)
+    )
+    await update.message.reply_text(response)
+
+@access_control
+async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Text command: /help"""
+    await update.message.reply_text(HELP_TEXT)
 
 # ========== ADMIN COMMANDS ==========
 @access_control
@@ -581,128 +779,108 @@ async def admin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Admin panel"""
     user_id = update.effective_user.id
     
-    if str(user_id) not in ADMIN_USER_ID:
+    if user_id not in ADMIN_IDS:
         await update.message.reply_text("❌ Admin access required.")
         return
     
     # ========== DATABASE STATS ==========
     try:
-        db = DatabaseManager()
-        total_users = db.db.query(User).count()
-        total_predictions = db.db.query(Prediction).count()
-        total_value_bets = db.db.query(ValueBet).filter(ValueBet.is_active == True).count()
-        db.close()
+        total_users, total_predictions, total_value_bets = await asyncio.to_thread(load_admin_counts)
     except Exception as e:
-        logger.error(f"❌ Database stats failed: {e}")
+        logger.error("❌ Database stats failed: %s", e)
         total_users = total_predictions = total_value_bets = "N/A"
     
-    response = f"""
-🔐 *ADMIN PANEL*
-
-📊 *DATABASE STATISTICS:*
-• Total Users: {total_users}
-• Total Predictions: {total_predictions}
-• Active Value Bets: {total_value_bets}
-• Invite-Only Mode: {'✅ Enabled' if INVITE_ONLY else '❌ Disabled'}
-
-⚙️ *ADMIN COMMANDS:*
-/dbstats - Detailed database statistics
-/adduser [id] - Add user to allowed list
-/listusers - List all allowed users
-/broadcast [msg] - Send message to all users
-
-📈 *USER MANAGEMENT:*
-• Use /adduser to grant access
-• Invite code: `invite123`
-• Database stores all user activity
-
-💾 *DATABASE INFO:*
-• PostgreSQL on Railway
-• Tables: users, predictions, value_bets
-• Auto-saves all predictions
-"""
+    response = ADMIN_PANEL_TEMPLATE.format(
+        total_users=total_users,
+        total_predictions=total_predictions,
+        total_value_bets=total_value_bets,
+        invite_mode='✅ Enabled' if INVITE_ONLY else '❌ Disabled',
+        invite_code=INVITE_CODE
+    )
     
-    await update.message.reply_text(response, parse_mode='Markdown')
+    await update.message.reply_text(response)
 
 @access_control
 async def dbstats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Detailed database statistics"""
     user_id = update.effective_user.id
     
-    if str(user_id) not in ADMIN_USER_ID:
+    if user_id not in ADMIN_IDS:
         await update.message.reply_text("❌ Admin access required.")
         return
     
     try:
-        db = DatabaseManager()
-        
-        # Get detailed stats
-        total_users = db.db.query(User).count()
-        active_users = db.db.query(User).filter(User.is_active == True).count()
-        premium_users = db.db.query(User).filter(User.is_premium == True).count()
-        
-        total_predictions = db.db.query(Prediction).count()
-        correct_predictions = db.db.query(Prediction).filter(Prediction.is_correct == True).count()
-        pending_predictions = db.db.query(Prediction).filter(Prediction.is_correct == None).count()
-        
-        total_value_bets = db.db.query(ValueBet).count()
-        active_value_bets = db.db.query(ValueBet).filter(ValueBet.is_active == True).count()
-        
-        # Recent activity
-        recent_users = db.db.query(User).order_by(User.last_seen.desc()).limit(5).all()
-        
-        db.close()
+        (total_users, active_users, premium_users,
+         total_predictions, correct_predictions, pending_predictions,
+         total_value_bets, active_value_bets,
+         recent_users) = await asyncio.to_thread(load_db_stats)
         
         # Calculate accuracy
         accuracy = (correct_predictions / (total_predictions - pending_predictions) * 100) if (total_predictions - pending_predictions) > 0 else 0
         
-        response = f"""
-📊 *DETAILED DATABASE STATISTICS*
-
-👥 *USERS:*
-• Total Users: {total_users}
-• Active Users: {active_users}
-• Premium Users: {premium_users}
-
-🎯 *PREDICTIONS:*
-• Total Predictions: {total_predictions}
-• Correct Predictions: {correct_predictions}
-• Pending Results: {pending_predictions}
-• System Accuracy: {accuracy:.1f}%
-
-💎 *VALUE BETS:*
-• Total Value Bets: {total_value_bets}
-• Active Value Bets: {active_value_bets}
-
-👤 *RECENTLY ACTIVE USERS:*
-"""
+        parts = [DBSTATS_TEMPLATE.format(
+            total_users=total_users,
+            active_users=active_users,
+            premium_users=premium_users,
+            total_predictions=total_predictions,
+            correct_predictions=correct_predictions,
+            pending_predictions=pending_predictions,
+            accuracy=accuracy,
+            total_value_bets=total_value_bets,
+            active_value_bets=active_value_bets
+        )]
         for i, user in enumerate(recent_users, 1):
-            last_seen = user.last_seen.strftime("%Y-%m-%d %H:%M") if user.last_seen else "Never"
-            response += f"{i}. {user.first_name} (ID: {user.telegram_id}) - {last_seen}\n"
+            last_seen = user.last_seen.isoformat(sep=' ', timespec='minutes') if user.last_seen else "Never"
+            parts.append(f"{i}. {user.first_name} (ID: {user.telegram_id}) - {last_seen}\n")
         
-        response += f"\n📅 *Last Updated:* {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+        parts.append(f"\n📅 *Last Updated:* {datetime.now().isoformat(sep=' ', timespec='seconds')}")
+        response = "".join(parts)
         
     except Exception as e:
-        logger.error(f"❌ Database stats failed: {e}")
+        logger.error("❌ Database stats failed: %s", e)
         response = f"❌ Could not load database statistics: {e}"
     
-    await update.message.reply_text(response, parse_mode='Markdown')
+    await update.message.reply_text(response)
+
+@access_control
+async def list_users_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """List allowed users (first 20)"""
+    user_id = update.effective_user.id
+    
+    if user_id not in ADMIN_IDS:
+        await update.message.reply_text("❌ Admin access required.")
+        return
+    
+    total = len(user_storage.allowed_users)
+    if not total:
+        await update.message.reply_text("👥 No users in the allowed list.")
+        return
+    
+    lines = [f"{i}. `{uid}`" for i, uid in enumerate(islice(user_storage.allowed_users, 20), 1)]
+    response = "👥 *ALLOWED USERS*\n\n" + "\n".join(lines)
+    if total > 20:
+        response += f"\n\n_Showing 20 of {total} users_"
+    
+    await update.message.reply_text(response)
 
 # ========== BUTTON HANDLERS ==========
 @access_control
 async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle all button presses"""
     query = update.callback_query
-    await query.answer()
     
-    data = query.data
+    # Acknowledge the press while the view renders: the two API calls are independent
+    await asyncio.gather(query.answer(), show_button_view(update, context, query.data))
+
+async def show_button_view(update: Update, context: ContextTypes.DEFAULT_TYPE, data: str):
+    """Replace the menu message with the view for a button"""
+    query = update.callback_query
     
     if data == "show_matches":
-        await todays_matches_command(update, context)
-        await start_command(update, context)
+        await query.edit_message_text(build_matches_text(), reply_markup=BACK_TO_MENU_MARKUP)
     
     elif data == "show_standings_menu":
-        await standings_command(update, context)
+        await query.edit_message_text(STANDINGS_MENU_TEXT, reply_markup=STANDINGS_MENU_MARKUP)
     
     elif data.startswith("standings_"):
         league_code = data.split("_")[1]
@@ -712,25 +890,188 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await show_predict_info_callback(update, context)
     
     elif data == "show_value_bets":
-        await value_bets_command(update, context)
-        await start_command(update, context)
+        response = await asyncio.to_thread(build_value_bets_text, context.bot_data.get('db_alive', True))
+        await query.edit_message_text(response, reply_markup=BACK_TO_MENU_MARKUP)
     
     elif data == "user_stats":
-        await mystats_command(update, context)
-        await start_command(update, context)
+        response = await asyncio.to_thread(
+            build_mystats_text, update.effective_user, context.bot_data.get('db_alive', True)
+        )
+        await query.edit_message_text(response, reply_markup=BACK_TO_MENU_MARKUP)
     
     elif data == "show_help":
-        await help_command(update, context)
-        await start_command(update, context)
+        await query.edit_message_text(HELP_TEXT, reply_markup=BACK_TO_MENU_MARKUP)
     
     elif data == "back_to_menu":
-        await start_command(update, context)
+        await edit_main_menu(query)
 
 # ========== HELPER FUNCTIONS ==========
+async def send_main_menu(message):
+    """Reply to a message with the main menu"""
+    await message.reply_text(**MAIN_MENU_KWARGS)
+
+async def edit_main_menu(query):
+    """Turn the message behind a button press back into the main menu"""
+    await query.edit_message_text(**MAIN_MENU_KWARGS)
+
+@lru_cache(maxsize=256)
+def render_quick_prediction(home: str, away: str) -> str:
+    """Full /predict reply; the analysis is deterministic, so repeat matchups reuse the text"""
+    analysis = data_manager.analyze_match(home, away)
+    probs = analysis['probabilities']
+    goals = analysis['goals']
+    value = analysis['value_bet']
+    
+    return QUICK_PREDICTION_TEMPLATE.format(
+        home=home,
+        away=away,
+        home_prob=probs['home'],
+        draw_prob=probs['draw'],
+        away_prob=probs['away'],
+        prediction=analysis['prediction'],
+        confidence=analysis['confidence'],
+        home_goals=goals['home'],
+        away_goals=goals['away'],
+        total_goals=goals['home'] + goals['away'],
+        market=value['market'],
+        selection=value['selection'],
+        odds=value['odds'],
+        edge=value['edge'],
+        save_note="💾 *Saving to your history*"
+    )
+
+def build_matches_text() -> str:
+    """Render today's matches grouped by league"""
+    matches = data_manager.get_todays_matches()
+    
+    if not matches:
+        return "No matches scheduled for today."
+    
+    parts = ["📅 *TODAY'S FOOTBALL MATCHES*\n"]
+    
+    # Group by league
+    matches_by_league = {}
+    for match in matches:
+        matches_by_league.setdefault(match['league'], []).append(match)
+    
+    for league_name, league_matches in matches_by_league.items():
+        parts.append(f"*{league_name}*")
+        parts.extend(f"⏰ {match['home']} vs {match['away']} ({match['time']})" for match in league_matches)
+        parts.append("")
+    
+    parts.append(f"_Total: {len(matches)} matches_")
+    
+    return "\n".join(parts)
+
+def build_value_bets_text(db_alive: bool = True) -> str:
+    """Render today's value bets from the database"""
+    if not db_alive:
+        return "❌ Could not load value bets. Please try again later."
+    
+    try:
+        bets = get_value_bets()
+        
+        if not bets:
+            return "💎 *NO VALUE BETS TODAY*\n\nNo strong value bets identified for today."
+        
+        parts = ["💎 *TODAY'S TOP VALUE BETS*\n"]
+        for i, bet in enumerate(bets, 1):
+            parts.append(
+                f"{i}. *{bet.match}* ({bet.league})\n"
+                f"   • Bet: {bet.selection} ({bet.bet_type})\n"
+                f"   • Odds: {bet.odds} | Probability: {bet.probability}%\n"
+                f"   • Edge: +{bet.edge}% | Confidence: {bet.confidence*100:.0f}%\n"
+                f"   • Stake: {bet.recommended_stake}\n"
+            )
+        
+        parts.append(
+            "📈 *Value Betting Strategy:*\n"
+            "• Only bet when edge > 3%\n"
+            "• Use 1/4 Kelly stake (conservative)\n"
+            "• Track all bets for analysis\n"
+        )
+        parts.append("_Data from Serie AI Database_")
+        return "\n".join(parts)
+        
+    except Exception as e:
+        logger.error("❌ Database value bets failed: %s", e)
+        return "❌ Could not load value bets. Please try again later."
+
+def build_mystats_text(tg_user, db_alive: bool = True) -> str:
+    """Render the statistics message for a Telegram user"""
+    user_id = tg_user.id
+    first_name = tg_user.first_name
+    
+    # The background probe already knows the database is down: skip the doomed queries
+    if not db_alive:
+        return MYSTATS_UNAVAILABLE_TEMPLATE.format(first_name=first_name, user_id=user_id)
+    
+    logger.info("📊 Getting stats for user %s", user_id)
+    
+    try:
+        with DatabaseManager() as db:
+            # First, ensure user exists in database
+            user = db.get_or_create_user(
+                telegram_id=user_id,
+                username=tg_user.username,
+                first_name=first_name,
+                last_name=tg_user.last_name
+            )
+            
+            # Get user statistics
+            stats = db.get_user_stats(user_id, user=user)
+        
+        total = stats['total_predictions']
+        correct = stats['correct_predictions']
+        accuracy = stats['accuracy']
+        
+        if total == 0:
+            response = MYSTATS_EMPTY_TEMPLATE.format(first_name=first_name, user_id=user_id)
+        else:
+            parts = [MYSTATS_TEMPLATE.format(
+                first_name=first_name,
+                user_id=user_id,
+                total=total,
+                correct=correct,
+                accuracy=accuracy
+            )]
+            
+            # Add recent predictions
+            for i, pred in enumerate(stats['recent_predictions'][:3], 1):
+                if pred.is_correct is None:
+                    result_icon = "⏳"
+                    status = "Pending"
+                elif pred.is_correct:
+                    result_icon = "✅"
+                    status = "Correct"
+                else:
+                    result_icon = "❌"
+                    status = "Wrong"
+                
+                parts.append(f"{i}. {pred.home_team} vs {pred.away_team} ({result_icon} {status})\n")
+            
+            if accuracy > 60:
+                parts.append("\n🏆 *Excellent accuracy! Keep it up!*")
+            elif accuracy > 50:
+                parts.append("\n👍 *Good work! Room for improvement.*")
+            else:
+                parts.append("\n💡 *Study the predictions more carefully.*")
+            
+            response = "".join(parts)
+        
+        logger.info("✅ Stats shown for user %s: %s predictions", user_id, total)
+        
+    except Exception as e:
+        logger.error("❌ Database error in mystats: %s", e, exc_info=True)
+        
+        # Fallback response
+        response = MYSTATS_UNAVAILABLE_TEMPLATE.format(first_name=first_name, user_id=user_id)
+    
+    return response
+
 async def show_standings(update: Update, league_code: str):
     """Show standings for a league"""
     query = update.callback_query
-    await query.answer()
     
     standings_data = data_manager.get_standings(league_code)
     
@@ -741,30 +1082,25 @@ async def show_standings(update: Update, league_code: str):
     league_name = standings_data['league_name']
     standings = standings_data['standings']
     
-    response = f"🏆 *{league_name} STANDINGS*\n\n"
-    response += "```\n"
-    response += " #  Team           P   W   D   L   GF  GA  GD  Pts\n"
-    response += "--- ------------- --- --- --- --- --- --- --- ---\n"
-    
-    for team in standings[:10]:
-        team_name = team['team'][:13]
-        response += f"{team['position']:2}  {team_name:13} {team['played']:3} {team['won']:3} {team['draw']:3} {team['lost']:3} {team['gf']:3} {team['ga']:3} {team['gd']:3} {team['points']:4}\n"
-    
-    response += "```\n"
-    response += f"_Showing top {min(10, len(standings))} of {len(standings)} teams_\n"
-    
-    keyboard = [
-        [InlineKeyboardButton("🔙 Back to Standings", callback_data="show_standings_menu")],
-        [InlineKeyboardButton("🏠 Main Menu", callback_data="back_to_menu")]
+    parts = [
+        f"🏆 *{league_name} STANDINGS*\n",
+        "```",
+        " #  Team           P   W   D   L   GF  GA  GD  Pts",
+        "--- ------------- --- --- --- --- --- --- --- ---"
     ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    parts.extend(
+        f"{team['position']:2}  {team['team'][:13]:13} {team['played']:3} {team['won']:3} {team['draw']:3} {team['lost']:3} {team['gf']:3} {team['ga']:3} {team['gd']:3} {team['points']:4}"
+        for team in standings[:10]
+    )
+    parts.append("```")
+    parts.append(f"_Showing top {min(10, len(standings))} of {len(standings)} teams_\n")
+    response = "\n".join(parts)
     
-    await query.edit_message_text(response, reply_markup=reply_markup, parse_mode='Markdown')
+    await query.edit_message_text(response, reply_markup=STANDINGS_BACK_MARKUP)
 
 async def show_predict_info_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Callback: Smart Prediction button"""
     query = update.callback_query
-    await query.answer()
     
     text = """
 🎯 *SMART PREDICTION*
@@ -788,10 +1124,7 @@ Example: `/predict Inter Milan`
 _Using advanced AI models + PostgreSQL database_
 """
     
-    keyboard = [[InlineKeyboardButton("🏠 Main Menu", callback_data="back_to_menu")]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    await query.edit_message_text(text, reply_markup=reply_markup, parse_mode='Markdown')
+    await query.edit_message_text(text, reply_markup=BACK_TO_MENU_MARKUP)
 
 # ========== MAIN FUNCTION ==========
 def main():
@@ -829,10 +1162,9 @@ def main():
             else:
                 print("⚠️  Missing some tables")
         
-        # Create sample data
+        # Create sample data (skipped while earlier samples are still active)
         from init_database import create_sample_data
         create_sample_data()
-        print("✅ Sample data created")
         
     except Exception as e:
         print(f"❌ Database initialization failed: {e}")
@@ -844,18 +1176,40 @@ def main():
         print("⚠️  API Key: NOT FOUND - Using simulation")
     
     print(f"🔒 Invite-Only Mode: {'✅ Enabled' if INVITE_ONLY else '❌ Disabled'}")
-    if ADMIN_USER_ID and ADMIN_USER_ID[0]:
-        print(f"👑 Admin Users: {len(ADMIN_USER_ID)} configured")
+    if ADMIN_IDS:
+        print(f"👑 Admin Users: {len(ADMIN_IDS)} configured")
     
-    # Start Flask for Railway
-    flask_thread = Thread(target=run_flask, daemon=True)
-    flask_thread.start()
+    # libuv-based event loop where available (uvloop does not support Windows)
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        print("✅ Event loop: uvloop")
+    except ImportError:
+        print("⚠️  Event loop: asyncio default")
+    
+    # Build bot application (web server for Railway runs on the same loop)
+    # Every reply is Markdown, so bind parse_mode once on the bot
+    # Updates from different chats are handled concurrently instead of one at a time;
+    # bursts of replies wait for a free pooled connection rather than failing after 1s
+    application = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .defaults(Defaults(parse_mode=ParseMode.MARKDOWN))
+        .concurrent_updates(True)
+        .pool_timeout(10.0)
+        .get_updates_pool_timeout(10.0)
+        .post_init(start_web_server)
+        .post_shutdown(on_shutdown)
+        .build()
+    )
     
-    # Build bot application
-    application = Application.builder().token(BOT_TOKEN).build()
+    # Keep bot_data['db_alive'] current without a health check in any handler
+    application.job_queue.run_repeating(probe_database, interval=DB_PROBE_INTERVAL, first=0)
+    application.job_queue.run_repeating(flush_last_seen, interval=LAST_SEEN_FLUSH_INTERVAL)
+    application.job_queue.run_repeating(flush_predictions, interval=PREDICTION_FLUSH_INTERVAL)
     
     # Register command handlers
-    application.add_handler(CommandHandler("start", start_command))
+    application.add_handler(CommandHandler("start", start_with_invite_check))
     application.add_handler(CommandHandler("predict", quick_predict_command))
     application.add_handler(CommandHandler("matches", todays_matches_command))
     application.add_handler(CommandHandler("standings", standings_command))
@@ -866,6 +1220,7 @@ def main():
     # Admin commands
     application.add_handler(CommandHandler("admin", admin_command))
     application.add_handler(CommandHandler("dbstats", dbstats_command))
+    application.add_handler(CommandHandler("listusers", list_users_command))
     
     # Register button handler
     application.add_handler(CallbackQueryHandler(button_handler))
@@ -882,11 +1237,16 @@ def main():
     print("=" * 60)
     print("📱 Test on Telegram with /start")
     
-    # Start bot
-    application.run_polling(
-        drop_pending_updates=True,
-        allowed_updates=Update.ALL_TYPES
-    )
+    # Start bot: webhooks when a public URL is configured, long polling otherwise
+    if WEBHOOK_URL:
+        print(f"🌐 Update delivery: webhook ({WEBHOOK_URL.rstrip('/')})")
+        asyncio.run(serve_webhook(application))
+    else:
+        print("🔁 Update delivery: long polling")
+        application.run_polling(
+            drop_pending_updates=True,
+            allowed_updates=Update.ALL_TYPES
+        )
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,86 +1,141 @@
-from models import SessionLocal, User, Prediction, Bet, ValueBet, SystemLog
+from models import engine, SessionLocal, User, Prediction, Bet, ValueBet, SystemLog
 from datetime import datetime, timedelta
 from sqlalchemy import desc, func, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import OperationalError
 import logging
 
 logger = logging.getLogger(__name__)
 
+def check_database_health() -> bool:
+    """Run a trivial query on a pooled connection; True when the database answers"""
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return True
+    except Exception:
+        return False
+
 class DatabaseManager:
     """Handles all database operations with error handling"""
     
     def __init__(self):
-        self.db = None
-        try:
-            self.db = SessionLocal()
-            # Test connection
-            self.db.execute(text("SELECT 1"))
-            logger.info("✅ Database connection successful")
-        except Exception as e:
-            logger.error(f"❌ Database connection failed: {e}")
-            raise
+        # Sessions are cheap: the connection comes from the engine's pool,
+        # which pre-pings it on checkout instead of a SELECT 1 per manager
+        self.db = SessionLocal()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def _insert_missing_users(self, rows):
+        """INSERT users ... ON CONFLICT DO NOTHING, so concurrent creators never collide"""
+        result = self.db.execute(
+            pg_insert(User).values(rows).on_conflict_do_nothing(index_elements=[User.telegram_id])
+        )
+        if result.rowcount:
+            logger.info("✅ Created %s new user(s)", result.rowcount)
+    
+    def _upsert_user(self, telegram_id: int, username: str = None, first_name: str = None, last_name: str = None):
+        """Stage the user insert/update in the current transaction without committing"""
+        user = self.db.query(User).filter(User.telegram_id == telegram_id).first()
+        
+        if not user:
+            self._insert_missing_users([{
+                'telegram_id': telegram_id,
+                'username': username,
+                'first_name': first_name,
+                'last_name': last_name,
+                'last_seen': datetime.utcnow()
+            }])
+            user = self.db.query(User).filter(User.telegram_id == telegram_id).one()
+        else:
+            user.last_seen = datetime.utcnow()
+        
+        user.username = username or user.username
+        user.first_name = first_name or user.first_name
+        user.last_name = last_name or user.last_name
+        
+        return user
     
     def get_or_create_user(self, telegram_id: int, username: str = None, first_name: str = None, last_name: str = None):
         """Get user or create if doesn't exist"""
         try:
-            user = self.db.query(User).filter(User.telegram_id == telegram_id).first()
-            
-            if not user:
-                user = User(
-                    telegram_id=telegram_id,
-                    username=username,
-                    first_name=first_name,
-                    last_name=last_name,
-                    last_seen=datetime.utcnow()
-                )
-                self.db.add(user)
-                self.db.commit()
-                self.db.refresh(user)
-                logger.info(f"✅ Created new user: {telegram_id}")
-            else:
-                user.last_seen = datetime.utcnow()
-                user.username = username or user.username
-                user.first_name = first_name or user.first_name
-                user.last_name = last_name or user.last_name
-                self.db.commit()
-            
+            user = self._upsert_user(telegram_id, username, first_name, last_name)
+            self.db.commit()
             return user
         except Exception as e:
-            logger.error(f"❌ get_or_create_user failed: {e}")
+            logger.error("❌ get_or_create_user failed: %s", e)
             self.db.rollback()
             raise
     
-    def save_prediction(self, telegram_id: int, home_team: str, away_team: str, league: str,
-                       predicted_result: str, home_prob: float, draw_prob: float, 
-                       away_prob: float, confidence: float):
-        """Save user prediction"""
+    def touch_users(self, telegram_ids):
+        """Bump last_seen for many users in a single UPDATE"""
         try:
-            user = self.get_or_create_user(telegram_id)
-            
-            prediction = Prediction(
-                user_id=user.id,
-                home_team=home_team,
-                away_team=away_team,
-                league=league,
-                predicted_result=predicted_result,
-                home_prob=home_prob,
-                draw_prob=draw_prob,
-                away_prob=away_prob,
-                confidence=confidence
+            updated = self.db.query(User).filter(User.telegram_id.in_(telegram_ids)).update(
+                {User.last_seen: datetime.utcnow()},
+                synchronize_session=False
             )
-            
-            self.db.add(prediction)
             self.db.commit()
-            logger.info(f"✅ Prediction saved for user {telegram_id}")
-            return prediction
+            return updated
         except Exception as e:
-            logger.error(f"❌ save_prediction failed: {e}")
+            logger.error("❌ touch_users failed: %s", e)
             self.db.rollback()
             raise
     
-    def get_user_stats(self, telegram_id: int):
+    def _stage_predictions(self, predictions):
+        """Add predictions (dicts of telegram_id plus Prediction columns) and their users to the current transaction"""
+        telegram_ids = list({data['telegram_id'] for data in predictions})
+        now = datetime.utcnow()
+        
+        self._insert_missing_users([{'telegram_id': telegram_id, 'last_seen': now} for telegram_id in telegram_ids])
+        users = {
+            user.telegram_id: user
+            for user in self.db.query(User).filter(User.telegram_id.in_(telegram_ids))
+        }
+        for user in users.values():
+            user.last_seen = now
+        
+        for data in predictions:
+            fields = dict(data)
+            self.db.add(Prediction(user=users[fields.pop('telegram_id')], **fields))
+    
+    def save_predictions(self, predictions):
+        """Save a batch of predictions in one transaction, falling back to one row at a time.
+        
+        Connection failures are re-raised untouched so the caller can retry the whole
+        batch later; any other failure only drops the rows that fail on their own.
+        """
+        try:
+            self._stage_predictions(predictions)
+            self.db.commit()
+            return len(predictions)
+        except OperationalError as e:
+            logger.error("❌ save_predictions failed: %s", e)
+            self.db.rollback()
+            raise
+        except Exception as e:
+            logger.error("❌ save_predictions batch failed, retrying row by row: %s", e)
+            self.db.rollback()
+        
+        saved = 0
+        for data in predictions:
+            try:
+                self._stage_predictions([data])
+                self.db.commit()
+                saved += 1
+            except Exception as e:
+                logger.error("❌ Dropped prediction for user %s: %s", data['telegram_id'], e)
+                self.db.rollback()
+        return saved
+    
+    def get_user_stats(self, telegram_id: int, user: User = None):
         """Get user prediction statistics"""
         try:
-            user = self.get_or_create_user(telegram_id)
+            # Callers that already synced the user pass it in to skip a second upsert
+            user = user or self.get_or_create_user(telegram_id)
             
             # Total predictions
             total = self.db.query(Prediction).filter(Prediction.user_id == user.id).count()
@@ -99,7 +154,7 @@ class DatabaseManager:
             # Calculate accuracy
             accuracy = (correct / total * 100) if total > 0 else 0
             
-            logger.info(f"✅ Stats retrieved for user {telegram_id}: {total} predictions")
+            logger.info("✅ Stats retrieved for user %s: %s predictions", telegram_id, total)
             
             return {
                 'total_predictions': total,
@@ -109,7 +164,7 @@ class DatabaseManager:
                 'user': user
             }
         except Exception as e:
-            logger.error(f"❌ get_user_stats failed: {e}")
+            logger.error("❌ get_user_stats failed: %s", e)
             return {
                 'total_predictions': 0,
                 'correct_predictions': 0,
@@ -124,17 +179,53 @@ class DatabaseManager:
             today = datetime.utcnow()
             tomorrow = today + timedelta(days=1)
             
-            bets = self.db.query(ValueBet).filter(
+            # Plain column rows: the handlers only render these, so skip ORM identity tracking
+            bets = self.db.query(
+                ValueBet.match,
+                ValueBet.league,
+                ValueBet.bet_type,
+                ValueBet.selection,
+                ValueBet.odds,
+                ValueBet.probability,
+                ValueBet.edge,
+                ValueBet.confidence,
+                ValueBet.recommended_stake
+            ).filter(
                 ValueBet.is_active == True,
                 ValueBet.expires_at > today,
                 ValueBet.expires_at < tomorrow
             ).order_by(desc(ValueBet.edge)).limit(10).all()
             
-            logger.info(f"✅ Retrieved {len(bets)} value bets")
+            logger.info("✅ Retrieved %s value bets", len(bets))
             return bets
         except Exception as e:
-            logger.error(f"❌ get_todays_value_bets failed: {e}")
-            return []
+            # Raise rather than return []: callers cache the result and must not
+            # mistake an outage for a day without value bets
+            logger.error("❌ get_todays_value_bets failed: %s", e)
+            raise
+    
+    def get_system_stats(self):
+        """All /dbstats counters in one round trip, plus the five most recently seen users"""
+        counts = self.db.query(
+            func.count(User.id).label('total_users'),
+            func.count(User.id).filter(User.is_active == True).label('active_users'),
+            func.count(User.id).filter(User.is_premium == True).label('premium_users'),
+            self.db.query(func.count(Prediction.id)).scalar_subquery().label('total_predictions'),
+            self.db.query(func.count(Prediction.id)).filter(
+                Prediction.is_correct == True
+            ).scalar_subquery().label('correct_predictions'),
+            self.db.query(func.count(Prediction.id)).filter(
+                Prediction.is_correct == None
+            ).scalar_subquery().label('pending_predictions'),
+            self.db.query(func.count(ValueBet.id)).scalar_subquery().label('total_value_bets'),
+            self.db.query(func.count(ValueBet.id)).filter(
+                ValueBet.is_active == True
+            ).scalar_subquery().label('active_value_bets')
+        ).one()
+        
+        recent_users = self.db.query(User).order_by(desc(User.last_seen)).limit(5).all()
+        
+        return counts, recent_users
     
     def close(self):
         """Close database connection"""
@@ -4,9 +4,19 @@ from models import init_db, SessionLocal, ValueBet
 from datetime import datetime, timedelta
 
 def create_sample_data():
-    """Create sample value bets"""
+    """Create sample value bets unless unexpired ones already exist"""
     db = SessionLocal()
     
+    # The bot seeds on every boot: skip restarts while the last batch is still live
+    live_bets = db.query(ValueBet).filter(
+        ValueBet.is_active == True,
+        ValueBet.expires_at > datetime.utcnow()
+    ).count()
+    if live_bets:
+        db.close()
+        print(f"ℹ️  Sample data skipped: {live_bets} active value bets exist")
+        return False
+    
     # Sample value bets
     sample_bets = [
         {
@@ -45,6 +55,7 @@ def create_sample_data():
     db.commit()
     db.close()
     print("✅ Sample data created")
+    return True
 
 if __name__ == "__main__":
     init_db()
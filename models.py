@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey
+from sqlalchemy import create_engine, Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
@@ -14,8 +14,15 @@ if not DATABASE_URL:
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Pooled engine: handlers borrow a connection per request instead of reconnecting
+engine = create_engine(
+    DATABASE_URL,
+    pool_size=10,
+    max_overflow=20,
+    pool_pre_ping=True,
+    pool_recycle=300
+)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 Base = declarative_base()
 
 class User(Base):
@@ -37,6 +44,11 @@ class User(Base):
     # Relationships
     predictions = relationship("Prediction", back_populates="user")
     bets = relationship("Bet", back_populates="user")
+    
+    # /dbstats lists the most recently seen users
+    __table_args__ = (
+        Index("ix_users_last_seen", last_seen.desc()),
+    )
 
 class Prediction(Base):
     """Prediction history"""
@@ -58,6 +70,12 @@ class Prediction(Base):
     
     # Relationships
     user = relationship("User", back_populates="predictions")
+    
+    # Per-user history (newest first) and the pending/correct counters
+    __table_args__ = (
+        Index("ix_pred_user_created", user_id, created_at.desc()),
+        Index("ix_pred_is_correct", is_correct),
+    )
 
 class Bet(Base):
     """Bet tracking"""
@@ -95,6 +113,11 @@ class ValueBet(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     expires_at = Column(DateTime)
+    
+    # Today's value bets: only active rows are ever searched by expiry
+    __table_args__ = (
+        Index("ix_value_bets_active_expires", expires_at, postgresql_where=(is_active == True)),
+    )
 
 class SystemLog(Base):
     """System logs"""
@@ -111,6 +134,11 @@ def init_db():
     """Initialize database tables"""
     try:
         Base.metadata.create_all(bind=engine)
+        
+        # create_all skips tables that already exist, so add any indexes they are missing
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=engine, checkfirst=True)
         print("✅ Database tables created successfully")
     except Exception as e:
         print(f"❌ Database error: {e}")